@@ -1,12 +1,20 @@
-import random
+import time
 import tkinter as tk
 from abc import ABC, abstractmethod
+from collections import deque
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Callable, TypedDict
+from typing import Any, Callable, Optional, TypedDict
+
+import numpy as np
+from numba import njit
 
 EventHandler = Callable[[Any], Any]
 
+# Droplets fall at the model's droplet speed times their group's factor, so
+# every droplet of a group can be moved with one canvas.move on the group tag.
+SPEED_GROUPS = {"drop_normal": 1.0, "drop_rare": 1.5, "drop_danger": 2.0}
+
 
 class KeyboardEventHandler(TypedDict):
     move_left: EventHandler
@@ -22,6 +30,9 @@ class MoveDirection(Enum):
 
 @dataclass
 class Coords:
+    # Declared by hand, dataclass(slots=True) needs Python 3.10
+    __slots__ = ("x", "y")
+
     x: float
     y: float
 
@@ -35,47 +46,176 @@ class Coords:
 
 
 class SpriteBase(ABC):
+    __slots__ = ("canvas", "coords", "ref")
+
     def __init__(self, canvas: tk.Canvas, coords: Coords, ref: int) -> None:
         super().__init__()
         self.canvas = canvas
         self.coords = coords
         self.ref = ref
 
-    def step(self):
-        self._do_step()
-        self.coords = Coords.from_canvas(self.canvas, self.ref)
+    def step(self, steps: float = 1.0):
+        # Positions are tracked in Python; the canvas is only ever written to.
+        self._do_step(steps)
 
     @abstractmethod
-    def _do_step(self) -> None:
+    def _do_step(self, steps: float) -> None:
         pass
 
 
-class DropletSprite(SpriteBase):
-    def __init__(
+# Explicit signatures pin the kernels to float32 columns and scalars, so the
+# arithmetic never silently widens to float64 and halves the SIMD lanes.
+@njit(
+    "(float32[::1], float32[::1], float32[::1], float32[::1], int32[::1],"
+    " boolean[::1], int64, float32, float32, float32, float32, float32,"
+    " boolean[::1], boolean[::1])",
+    cache=True,
+)
+def step_droplets(
+    x,
+    y,
+    size,
+    speed_factor,
+    points,
+    danger,
+    n,
+    speed,
+    cup_x,
+    cup_w,
+    cup_top,
+    height,
+    hit_bottom,
+    hit_cup,
+):
+    """Advance the first ``n`` droplets by one frame and test them for hits.
+
+    ``hit_bottom`` and ``hit_cup`` are filled in place; a droplet that reached
+    the bottom never counts as caught. Regular droplets and danger drops share
+    the pass. Returns the points of caught droplets, how many droplets were
+    missed and whether a danger drop landed in the cup.
+    The loop body is branch-free so LLVM can vectorise the whole AABB test.
+    """
+    half = np.float32(0.5)
+    cup_right = cup_x + cup_w
+    score = 0
+    missed = 0
+    danger_caught = False
+    for i in range(n):
+        drop_y = y[i] + speed_factor[i] * speed
+        y[i] = drop_y
+        bottom = drop_y >= height
+        caught = (
+            (drop_y < height)
+            & (drop_y + size[i] * half > cup_top)
+            & (x[i] < cup_right)
+            & (x[i] + size[i] > cup_x)
+        )
+        hit_bottom[i] = bottom
+        hit_cup[i] = caught
+        safe = not danger[i]
+        score += points[i] * (caught & safe)
+        missed += bottom & safe
+        danger_caught |= caught & danger[i]
+    return score, missed, danger_caught
+
+
+@njit(
+    "(int64, boolean[::1], boolean[::1], float32[::1], float32[::1], float32[::1],"
+    " float32[::1], int32[::1], boolean[::1], int64[::1])",
+    cache=True,
+)
+def compact_droplets(
+    n, hit_bottom, hit_cup, x, y, size, speed_factor, points, danger, ref
+):
+    """Shift the droplets not flagged as hit down over the removed ones.
+
+    Works in place on the first ``n`` entries and returns the new count.
+    """
+    new_n = 0
+    for i in range(n):
+        if not (hit_bottom[i] or hit_cup[i]):
+            x[new_n] = x[i]
+            y[new_n] = y[i]
+            size[new_n] = size[i]
+            speed_factor[new_n] = speed_factor[i]
+            points[new_n] = points[i]
+            danger[new_n] = danger[i]
+            ref[new_n] = ref[i]
+            new_n += 1
+    return new_n
+
+
+class DropletBuffer:
+    """Struct-of-arrays storage for the droplets currently on screen.
+
+    Only the first ``n`` entries of each column are live.
+    """
+
+    COLUMNS = ("x", "y", "size", "speed_factor", "points", "danger", "ref")
+    # Per-frame output of step_droplets, sized alongside the columns
+    FLAGS = ("hit_bottom", "hit_cup")
+
+    def __init__(self, capacity: int = 256) -> None:
+        self.n = 0
+        self.x = np.empty(capacity, dtype=np.float32)
+        self.y = np.empty(capacity, dtype=np.float32)
+        self.size = np.empty(capacity, dtype=np.float32)
+        self.speed_factor = np.empty(capacity, dtype=np.float32)
+        self.points = np.empty(capacity, dtype=np.int32)
+        self.danger = np.empty(capacity, dtype=np.bool_)
+        self.ref = np.empty(capacity, dtype=np.int64)
+        self.hit_bottom = np.zeros(capacity, dtype=np.bool_)
+        self.hit_cup = np.zeros(capacity, dtype=np.bool_)
+
+    def append(
         self,
-        canvas: tk.Canvas,
-        coords: Coords,
+        x: float,
+        y: float,
         size: float,
-        color: str,
-        speed: float,
+        speed_factor: float,
         points: int,
+        danger: bool,
+        ref: int,
     ) -> None:
-        self.droplet = canvas.create_oval(
-            coords.x, coords.y, coords.x + size, coords.y + size, fill=color
+        if self.n == len(self.x):
+            self._grow()
+        i = self.n
+        self.x[i] = x
+        self.y[i] = y
+        self.size[i] = size
+        self.speed_factor[i] = speed_factor
+        self.points[i] = points
+        self.danger[i] = danger
+        self.ref[i] = ref
+        self.n += 1
+
+    def compact(self) -> None:
+        """Drop every live entry flagged by the last step_droplets call."""
+        self.n = compact_droplets(
+            self.n,
+            self.hit_bottom,
+            self.hit_cup,
+            self.x,
+            self.y,
+            self.size,
+            self.speed_factor,
+            self.points,
+            self.danger,
+            self.ref,
         )
-        self.size = size
-        self.speed = speed
-        self.points = points
-        super().__init__(canvas, coords, self.droplet)
 
-    def _do_step(self) -> None:
-        self.canvas.move(self.droplet, 0, self.speed)
+    def clear(self) -> None:
+        self.n = 0
 
-    def delete(self):
-        self.canvas.delete(self.droplet)
+    def _grow(self) -> None:
+        capacity = len(self.x) * 2
+        for name in self.COLUMNS + self.FLAGS:
+            setattr(self, name, np.resize(getattr(self, name), capacity))
 
 
 class CupSprite(SpriteBase):
+    __slots__ = ("cup", "width", "height", "speed", "direction", "_right_bound")
+
     def __init__(
         self,
         canvas: tk.Canvas,
@@ -92,16 +232,23 @@ class CupSprite(SpriteBase):
         self.height = height
         self.speed = speed
         self.direction = MoveDirection.NONE
+        # The window isn't resizable, so the right edge never moves. Use the
+        # configured width, winfo_width() is 1 until the canvas is mapped.
+        self._right_bound = float(canvas.cget("width")) - width
         super().__init__(canvas, coords, self.cup)
 
-    def _do_step(self) -> None:
+    def _do_step(self, steps: float) -> None:
+        distance = self.speed * steps
         if self.direction == MoveDirection.LEFT and self.coords.x > 0:
-            self.canvas.move(self.cup, -self.speed, 0)
+            distance = min(distance, self.coords.x)
+            self.coords.x -= distance
+            self.canvas.move(self.cup, -distance, 0)
         elif (
-            self.direction == MoveDirection.RIGHT
-            and self.coords.x + self.width < self.canvas.winfo_width()
+            self.direction == MoveDirection.RIGHT and self.coords.x < self._right_bound
         ):
-            self.canvas.move(self.cup, self.speed, 0)
+            distance = min(distance, self._right_bound - self.coords.x)
+            self.coords.x += distance
+            self.canvas.move(self.cup, distance, 0)
 
     def set_move_direction(self, direction: MoveDirection):
         self.direction = direction
@@ -111,8 +258,9 @@ class CupSprite(SpriteBase):
 
 
 class KeyboardControl:
-    def __init__(self, view: tk.Tk) -> None:
+    def __init__(self, view: tk.Tk, handlers: KeyboardEventHandler) -> None:
         self.view = view
+        self.handlers = handlers
         self.events: dict[str, bool] = {}
 
         self.view.bind("<KeyPress>", self.handle_key_press)
@@ -128,9 +276,60 @@ class KeyboardControl:
 
     def handle_key_press(self, event: tk.Event):
         self.events[event.keysym] = True
+        self._dispatch(event)
 
     def handle_key_release(self, event: tk.Event):
         self.events[event.keysym] = False
+        self._dispatch(event)
+
+    def _dispatch(self, event: tk.Event):
+        left_down = self.get("Left")
+        right_down = self.get("Right")
+        if left_down ^ right_down:  # one or the other, but not both
+            if left_down:
+                self.handlers["move_left"](event)
+            else:
+                self.handlers["move_right"](event)
+        else:
+            self.handlers["move_none"](event)
+
+
+class IntervalTimer:
+    """Fixed-rate deadline tracker driven by the controller's master tick."""
+
+    def __init__(self, interval_ms: int) -> None:
+        self.interval = interval_ms / 1000
+        self.deadline = 0.0
+
+    def reset(self, now: float) -> None:
+        self.deadline = now
+
+    def due(self, now: float) -> bool:
+        if now < self.deadline:
+            return False
+        # Don't try to catch up after a long stall, just restart the cadence
+        if now - self.deadline > self.interval:
+            self.deadline = now
+        self.deadline += self.interval
+        return True
+
+
+class RandomBatch:
+    """Random numbers drawn from NumPy in batches and handed out one by one."""
+
+    def __init__(self, draw: Callable[[int], np.ndarray], size: int = 1024) -> None:
+        self.draw = draw
+        self.size = size
+        self.values: list = []
+        self.index = 0
+
+    def next(self):
+        if self.index == len(self.values):
+            self.values = self.draw(self.size).tolist()
+            self.index = 0
+        value = self.values[self.index]
+        self.index += 1
+        return value
 
 
 class WaterDropGameModel:
@@ -162,6 +361,9 @@ class WaterDropGameModel:
 
 
 class WaterDropGameView(tk.Tk):
+    # Hidden ovals created up front and recycled for droplets
+    POOL_SIZE = 128
+
     def __init__(self, model: WaterDropGameModel, on_restart: Callable):
         super().__init__()
         self.model = model
@@ -176,6 +378,8 @@ class WaterDropGameView(tk.Tk):
             self, text=f"Score: {self.model.score}", font=("Arial", 16)
         )
         self.score_label.place(relx=0.5, rely=0.05, anchor=tk.CENTER)
+        # Score currently shown by score_label
+        self.shown_score = self.model.score
         self.high_score_label = tk.Label(
             self, text=f"High Score: {self.model.high_score}", font=("Arial", 16)
         )
@@ -187,9 +391,16 @@ class WaterDropGameView(tk.Tk):
         self.quit_button = tk.Button(self, text="Quit", command=self.quit_game)
         self.on_restart = on_restart
 
-        self.droplets = []
-        self.danger_drops = []
+        self.droplets = DropletBuffer()
         self._init_cup()
+        # Created after the cup so droplets are drawn on top of it
+        self._init_pool()
+
+    def _init_pool(self):
+        self.droplet_pool = deque(
+            self.canvas.create_oval(0, 0, 0, 0, state=tk.HIDDEN)
+            for _ in range(self.POOL_SIZE)
+        )
 
     def _init_cup(self):
         self.cup = CupSprite(
@@ -203,31 +414,51 @@ class WaterDropGameView(tk.Tk):
 
     def restart_game(self):
         self.model.reset()
-        self.score_label.config(text=f"Score: {self.model.score}")
+        self.update_score()
         self.high_score_label.config(text=f"High Score: {self.model.high_score}")
         self.canvas.delete("all")
         self.retry_button.place_forget()
         self.quit_button.place_forget()
         self.game_over_label.place_forget()
-        self.droplets = []
-        self.danger_drops = []
+        self.droplets.clear()
         self._init_cup()
+        self._init_pool()
         self.on_restart()
 
     def update_score(self):
-        self.score_label.config(text=f"Score: {self.model.score}")
+        # Reconfiguring the label re-lays it out, skip it if nothing changed
+        if self.model.score != self.shown_score:
+            self.shown_score = self.model.score
+            self.score_label.config(text=f"Score: {self.model.score}")
 
     def create_droplet(
-        self, x: float, y: float, size: float, color: str, speed: float, points: int
+        self, x: float, y: float, size: float, color: str, group: str, points: int
     ):
-        droplet = DropletSprite(self.canvas, Coords(x, y), size, color, speed, points)
-        self.droplets.append(droplet)
-
-    def create_danger_droplet(
-        self, x: float, y: float, size: float, color: str, speed: float
-    ):
-        danger_drop = DropletSprite(self.canvas, Coords(x, y), size, color, speed, -100)
-        self.danger_drops.append(danger_drop)
+        ref = self._acquire_droplet(x, y, size, color, group)
+        self.droplets.append(x, y, size, SPEED_GROUPS[group], points, False, ref)
+
+    def create_danger_droplet(self, x: float, y: float, size: float, color: str):
+        ref = self._acquire_droplet(x, y, size, color, "drop_danger")
+        self.droplets.append(x, y, size, SPEED_GROUPS["drop_danger"], -100, True, ref)
+
+    def release_droplets(self, refs: list[int]):
+        """Hide the given droplet items and return them to the pool."""
+        for ref in refs:
+            self.canvas.itemconfigure(ref, state=tk.HIDDEN, tags=())
+        self.droplet_pool.extend(refs)
+
+    def _acquire_droplet(
+        self, x: float, y: float, size: float, color: str, group: str
+    ) -> int:
+        tags = ("drop", group)
+        if not self.droplet_pool:
+            return self.canvas.create_oval(
+                x, y, x + size, y + size, fill=color, tags=tags
+            )
+        ref = self.droplet_pool.popleft()
+        self.canvas.coords(ref, x, y, x + size, y + size)
+        self.canvas.itemconfigure(ref, fill=color, state=tk.NORMAL, tags=tags)
+        return ref
 
     def quit_game(self):
         self.quit_button.destroy()
@@ -239,115 +470,159 @@ class WaterDropGameController:
         self.model = WaterDropGameModel(width, height)
         self.view = WaterDropGameView(self.model, on_restart=self._reset_timers)
         self.spawn_timeout = 1000
+        # Speeds are in pixels per move_droplet_timeout, physics is scaled by
+        # the time that actually passed between ticks
         self.move_droplet_timeout = 50
-        self.keyboard_repeat = 50
-        self.keyboard_control = KeyboardControl(self.view)
+        # Master tick, roughly one display refresh at 60 Hz
+        self.frame_timeout = 16
+        # Longest stretch of time a single tick will simulate
+        self.max_frame_timeout = 100
+        self.spawn_timer = IntervalTimer(self.spawn_timeout)
+        self.last_tick = 0.0
+        self.rng = np.random.default_rng()
+        self.spawn_x = RandomBatch(
+            lambda size: self.rng.integers(50, width - 50, size=size, endpoint=True)
+        )
+        self.spawn_roll = RandomBatch(self.rng.random)
+        self.tick_job: Optional[str] = None
+        self.idle = False
+        self.keyboard_control = KeyboardControl(
+            self.view,
+            KeyboardEventHandler(
+                move_left=self._cup_mover(MoveDirection.LEFT),
+                move_right=self._cup_mover(MoveDirection.RIGHT),
+                move_none=self._cup_mover(MoveDirection.NONE),
+            ),
+        )
         self._reset_timers()
 
+    def _cup_mover(self, direction: MoveDirection) -> EventHandler:
+        def handler(_):
+            # Look the cup up on every event, restarting the game replaces it
+            self.view.cup.set_move_direction(direction)
+            self._wake()
+
+        return handler
+
     def _reset_timers(self):
-        self.view.after(0, self.spawn_droplet)
-        self.view.after(0, self.move_droplets)
-        self.view.after(0, self.handle_keyboard)
+        self.dying_refs: list[int] = []
+        now = time.perf_counter()
+        self.spawn_timer.reset(now)
+        self.last_tick = now
+        if self.tick_job is not None:
+            self.view.after_cancel(self.tick_job)
+        self.tick_job = self.view.after(0, self.tick)
+
+    def _wake(self):
+        """Run the next tick right away if the loop is sleeping while idle."""
+        if self.idle and self.tick_job is not None:
+            self.view.after_cancel(self.tick_job)
+            self.idle = False
+            # Nothing moved while asleep, don't simulate the time spent idle
+            self.last_tick = time.perf_counter()
+            self.tick_job = self.view.after(0, self.tick)
+
+    def _is_idle(self) -> bool:
+        return (
+            self.view.droplets.n == 0
+            and not self.dying_refs
+            and self.view.cup.direction == MoveDirection.NONE
+        )
+
+    def tick(self):
+        self.tick_job = None
+        if self.model.game_over:
+            return
+        now = time.perf_counter()
+        # Clamp so a stall (GC pause, dragged window) doesn't teleport drops
+        elapsed = min(now - self.last_tick, self.max_frame_timeout / 1000)
+        self.last_tick = now
+        steps = elapsed * 1000 / self.move_droplet_timeout
+        if self.spawn_timer.due(now):
+            self.spawn_droplet()
+        self.move_droplets(steps)
+        self.view.cup.step(steps)
+        if not self.model.game_over:
+            delay = self.frame_timeout
+            # Nothing on screen can change before the next spawn or key press
+            self.idle = self._is_idle()
+            if self.idle:
+                until_spawn = int((self.spawn_timer.deadline - now) * 1000)
+                delay = max(delay, until_spawn)
+            self.tick_job = self.view.after(delay, self.tick)
 
     def spawn_droplet(self):
         if not self.model.game_over:
             self.model.increase_difficulty()  # Increase difficulty
-            x = random.randint(50, self.model.width - 50)
+            x = self.spawn_x.next()
             y = 0
-            if random.random() < 0.05:
+            if self.spawn_roll.next() < 0.05:
                 droplet_size = 20
                 droplet_color = "gold"
                 points = 50
                 # Rare drops move 1.5 times faster
-                droplet_speed = self.model.droplet_speed * 1.5
+                droplet_group = "drop_rare"
             else:
                 droplet_size = 10
                 droplet_color = "blue"
                 points = 10
-                droplet_speed = self.model.droplet_speed
+                droplet_group = "drop_normal"
 
             self.view.create_droplet(
-                x, y, droplet_size, droplet_color, droplet_speed, points
+                x, y, droplet_size, droplet_color, droplet_group, points
             )
-            self.view.after(self.spawn_timeout, self.spawn_droplet)
 
     def spawn_danger_drop(self):
         if not self.model.game_over:
-            x = random.randint(50, 750)
+            x = self.spawn_x.next()
             y = 0
-            self.view.create_danger_droplet(
-                x, y, 30, "red", self.model.droplet_speed * 2
-            )
-
-    def did_droplet_hit_cup(self, droplet: DropletSprite) -> bool:
-        droplet_bottom = droplet.coords.y + droplet.size / 2
-        droplet_left = droplet.coords.x
-        droplet_right = droplet.coords.x + droplet.size
-
-        cup_top = self.view.cup.coords.y - self.view.cup.height
-        cup_left = self.view.cup.coords.x
-        cup_right = self.view.cup.coords.x + self.view.cup.width
-
-        return (
-            droplet_bottom > cup_top
-            and droplet_left < cup_right
-            and droplet_right > cup_left
-        )
+            self.view.create_danger_droplet(x, y, 30, "red")
 
-    def move_droplets(self):
-        if not self.model.game_over:
-            next_droplets = []
-            for droplet in self.view.droplets:
-                droplet.step()
-                # hits bottom
-                if droplet.coords.y >= self.model.height:
-                    # Let the next frame render before deleting the droplet
-                    self.view.after(self.move_droplet_timeout, droplet.delete)
-                    self.spawn_danger_drop()
-                # hits cup
-                elif self.did_droplet_hit_cup(droplet):
-                    # Let the next frame render before deleting the droplet
-                    self.view.after(self.move_droplet_timeout, droplet.delete)
-                    self.model.update_score(droplet.points)
-                    self.view.update_score()
-                # still in the game
-                else:
-                    next_droplets.append(droplet)
-
-            # Make sure to update the droplets list after the loop
-            self.view.droplets = next_droplets
-
-            next_danger_droplets = []
-            for danger_drop in self.view.danger_drops:
-                danger_drop.step()
-                # hits bottom
-                if danger_drop.coords.y >= self.model.height:
-                    danger_drop.delete()
-                # hits cup
-                elif self.did_droplet_hit_cup(danger_drop):
-                    self.end_game()
-                # still in the game
-                else:
-                    next_danger_droplets.append(danger_drop)
-
-            # Make sure to update the danger_droplets list after the loop
-            self.view.danger_drops = next_danger_droplets
-
-            self.view.after(self.move_droplet_timeout, self.move_droplets)
-
-    def handle_keyboard(self):
+    def move_droplets(self, steps: float = 1.0):
+        """Advance the droplets by ``steps`` multiples of their per-step speed."""
         if not self.model.game_over:
-            left_down = self.keyboard_control.get("Left")
-            right_down = self.keyboard_control.get("Right")
-            if left_down ^ right_down:  # one or the other, but not both
-                if left_down:
-                    self.view.cup.set_move_direction(MoveDirection.LEFT)
-                else:
-                    self.view.cup.set_move_direction(MoveDirection.RIGHT)
-            else:
-                self.view.cup.set_move_direction(MoveDirection.NONE)
-            self.view.cup.step()
-            self.view.after(self.keyboard_repeat, self.handle_keyboard)
+            # These were left on screen for a frame where they landed
+            if self.dying_refs:
+                self.view.release_droplets(self.dying_refs)
+                self.dying_refs = []
+
+            speed = self.model.droplet_speed * steps
+            for tag, factor in SPEED_GROUPS.items():
+                self.view.canvas.move(tag, 0, speed * factor)
+
+            drops = self.view.droplets
+            cup = self.view.cup
+            score, missed, danger_caught = step_droplets(
+                drops.x,
+                drops.y,
+                drops.size,
+                drops.speed_factor,
+                drops.points,
+                drops.danger,
+                drops.n,
+                speed,
+                cup.coords.x,
+                cup.width,
+                cup.coords.y - cup.height,
+                self.model.height,
+                drops.hit_bottom,
+                drops.hit_cup,
+            )
+
+            # Most frames nothing lands, so leave the buffer untouched
+            n = drops.n
+            hit_bottom = drops.hit_bottom[:n]
+            hit_cup = drops.hit_cup[:n]
+            if hit_bottom.any() or hit_cup.any():
+                self.dying_refs = drops.ref[:n][hit_bottom | hit_cup].tolist()
+                drops.compact()
+            if score:
+                self.model.update_score(score)
+                self.view.update_score()
+            if danger_caught:
+                self.end_game()
+            for _ in range(missed):
+                self.spawn_danger_drop()
 
     def start_game(self):
         self.view.mainloop()